@@ -14,9 +14,10 @@
 # ==============================================================================
 
 from argparse import ArgumentParser
-from torch.cuda import device_count
-from torch.multiprocessing import spawn
 
+# Tek GPU ile eğitildiği için torch.multiprocessing.spawn / device_count
+# burada kullanılmıyor; DDP gerekirse bu importlar ilgili dalda tembel
+# olarak yapılmalı (spawn, başlangıçta gereksiz multiprocessing durumu yükler).
 from learner import train
 from params import params
 
@@ -582,8 +582,8 @@ def compare_complex(esti_list, label_list, frame_list, feat_type='sqrt'):
 
 
 def compare(refdir, degdir, use_tqdm=True):
+    from concurrent.futures import ProcessPoolExecutor
     from multiprocessing import cpu_count
-    from multiprocessing import Pool
     import numpy as np
     import glob, os
 
@@ -591,20 +591,22 @@ def compare(refdir, degdir, use_tqdm=True):
         return [compareone_load_wav([refdir, degdir])]
 
     n = np.min([np.max([cpu_count() - 2, 1]), 20])
-    pool = Pool(processes=n)
     reffiles = sorted(glob.glob('%s/*.wav' % refdir))
     degfiles = sorted(glob.glob('%s/*.wav' % degdir))
 
     assert len(reffiles) == len(degfiles)
 
-    import tqdm
+    # per-file PESQ/STOI computations are independent, so fan the pairs out
+    # with chunked map and collect rows into a preallocated (N, 6) array
     args = list(zip(reffiles, degfiles))
-    if use_tqdm:
-        res = list(tqdm.tqdm(pool.imap(compareone_load_wav, args), "Calculating", ncols=60))
-    else:
-        res = list(pool.imap(compareone_load_wav, args))
-    pool.close()
-    pool.join()
+    res = np.empty((len(args), 6), dtype=np.float64)
+    with ProcessPoolExecutor(max_workers=n) as executor:
+        it = executor.map(compareone_load_wav, args, chunksize=8)
+        if use_tqdm:
+            import tqdm
+            it = tqdm.tqdm(it, "Calculating", total=len(args), ncols=60)
+        for i, row in enumerate(it):
+            res[i] = row
     return res
 
 
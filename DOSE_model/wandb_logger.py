@@ -23,9 +23,9 @@ def evaluate_and_log_metrics(clean_speech_path, output_dir, model_name):
     res = compare(clean_speech_path, output_dir) # Temiz ve gürültülü ses dosyalarını karşılaştırır ve metrikleri hesaplar
     t2 = time.time() # Değerlendirme bitiş zamanı
 
-    # Hesaplanan metrikleri (res) bir numpy dizisine dönüştürür ve ortalamasını alır
-    pm = np.array([x[0:] for x in res])
-    pm = np.mean(pm, axis=0) # Tüm dosyaların metrik ortalamalarını hesaplar
+    # Hesaplanan metrikleri (res) doğrudan bir numpy dizisine dönüştürür ve
+    # ortalamasını alır (satır satır kopyalayan ara liste oluşturulmaz)
+    pm = np.asarray(res, dtype=np.float64).mean(axis=0) # Tüm dosyaların metrik ortalamalarını hesaplar
 
     # Ortalaması alınmış metrikleri bir sözlük (dictionary) haline getirir
     metrics = {
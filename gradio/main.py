@@ -1,11 +1,31 @@
 import gradio as gr
-import librosa
 import numpy as np
 import matplotlib.pyplot as plt
+import torch
+import torchaudio
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 
 
+# Spektrogram hesabı GPU varsa GPU'da yapılır (torch FFT, CPU'da da çok
+# çekirdekli çalışır); dönüşümler ilk kullanımda bir kez kurulur.
+_DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+_N_FFT = 2048
+_HOP_LENGTH = _N_FFT // 2
+_spec = None
+_amp_to_db = None
+
+
+def _get_spectrogram_transforms():
+    """Spektrogram dönüşümlerini tembel olarak kurar ve önbellekler."""
+    global _spec, _amp_to_db
+    if _spec is None:
+        _spec = torchaudio.transforms.Spectrogram(
+            n_fft=_N_FFT, hop_length=_HOP_LENGTH, power=1.0).to(_DEVICE)
+        _amp_to_db = torchaudio.transforms.AmplitudeToDB(
+            stype="magnitude", top_db=80.0).to(_DEVICE)
+    return _spec, _amp_to_db
+
 
 def create_info_page():
     with gr.Blocks() as info_page:
@@ -27,23 +47,48 @@ def create_info_page():
         """)
     return info_page
 
+def _downsample_waveform(y, sr, max_points=5000):
+    """Dalga formunu tarayıcıya göndermeden önce min/maks zarfına indirger.
+
+    Her kovadan (min, maks) çifti alındığı için tepe değerler korunur;
+    Plotly'ye giden nokta sayısı ~2*max_points ile sınırlanır ve JSON
+    yükü/çizim süresi buna orantılı küçülür.
+    """
+    if len(y) <= max_points:
+        return np.arange(len(y)) / sr, y
+    step = len(y) // max_points
+    n = len(y) // step
+    y2 = y[:step * n].reshape(n, step)
+    env = np.stack([y2.min(axis=1), y2.max(axis=1)], axis=1).ravel()
+    # Her kovanın min/maks noktaları kova ortası zamanına yerleştirilir
+    time = np.repeat((np.arange(n) + 0.5) * step / sr, 2)
+    return time, env
+
+
 def show_waveform(audio):
-    # Ses dosyasını yükle
-    y, sr = librosa.load(audio)
-    
-    time = np.linspace(0, len(y) / sr, num=len(y))
+    # Ses dosyasını yükle (torchaudio: C tarafında decode, tensör çıktısı)
+    wav, sr = torchaudio.load(audio)
+    wav = wav.mean(dim=0)  # çok kanallıysa mono'ya indir
+    y = wav.numpy()
+
+    # Tarayıcıya her örneği göndermek yerine min/maks zarfı gönderilir ve
+    # SVG yerine WebGL (Scattergl) ile çizilir.
+    time, y_env = _downsample_waveform(y, sr)
     fig = make_subplots(rows=2, cols=1, subplot_titles=["Dalga Formu", "Spektrum"])
 
-    fig.add_trace(go.Scatter(x=time, y=y, mode='lines', name='Dalga Formu'), row=1, col=1)
+    fig.add_trace(go.Scattergl(x=time, y=y_env, mode='lines', name='Dalga Formu'), row=1, col=1)
     fig.update_xaxes(title_text="Zaman (saniye)", row=1, col=1)
     fig.update_yaxes(title_text="Genlik", row=1, col=1)
 
-    # Spektrumu oluştur
-    D = librosa.amplitude_to_db(np.abs(librosa.stft(y)), ref=np.max)
+    # Spektrumu oluştur (GPU varsa GPU'da; sonuç Plotly için CPU'ya alınır)
+    spec, amp_to_db = _get_spectrogram_transforms()
+    with torch.no_grad():
+        D = amp_to_db(spec(wav.to(_DEVICE))).cpu().numpy()
+    D = D - D.max()  # librosa'daki ref=np.max davranışı: 0 dB = tepe değer
     img = go.Heatmap(
         z=D,
-        x=librosa.times_like(D, sr=sr),
-        y=librosa.fft_frequencies(sr=sr),
+        x=np.arange(D.shape[1]) * _HOP_LENGTH / sr,
+        y=np.linspace(0, sr / 2, D.shape[0]),
         colorscale= "Jet",
         colorbar=dict(title='dB')
     )
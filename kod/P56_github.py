@@ -12,6 +12,68 @@ George Close (glclose1@sheffield.ac.uk) 2022
 import numpy as np
 from scipy.signal import lfilter
 
+# Numba varsa aktivite sayımı, orijinal MATLAB semantiğini ('break' dahil)
+# koruyan JIT derlenmiş döngüyle yapılır; yoksa vektörel NumPy yolu kullanılır.
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+if _HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _p56_envelope(x_abs, g):
+        """İki kademeli üstel zarfı (p ardından q) tek geçişte hesaplar.
+
+        İki ardışık lfilter çağrısı sinyal üzerinden iki tam bellek geçişi
+        yapar; kaskad iki özdeş tek kutuplu IIR olduğu için iki durum
+        değişkeniyle tek skaler döngüde birleştirilebilir. float32 çalışmak
+        önbellek satırı başına iki kat örnek taşır.
+        """
+        n = x_abs.shape[0]
+        q = np.empty(n, dtype=np.float32)
+        gf = np.float32(g)
+        one_minus_g = np.float32(1.0) - gf
+        p_prev = np.float32(0.0)
+        q_prev = np.float32(0.0)
+        for k in range(n):
+            p_prev = gf * p_prev + one_minus_g * x_abs[k]
+            q_prev = gf * q_prev + one_minus_g * p_prev
+            q[k] = q_prev
+        return q
+
+    @njit(cache=True, boundscheck=False)
+    def _count_activity_numba(q, c, I, num_thresholds):
+        """P.56 aktivite/hangover sayım döngüsünün birebir JIT sürümü."""
+        a = np.zeros(num_thresholds, np.int64)
+        hang = np.full(num_thresholds, I, np.int64)
+        c0 = c[0]
+        for k in range(q.shape[0]):
+            qk = q[k]
+            if qk < c0:
+                # Zarf en küçük eşiğin (2^-15) de altında: hiçbir eşik
+                # aşılamaz, yalnızca hangover sayımı ilerler. Konuşmadaki
+                # uzun sessiz bölütlerde 15 karşılaştırmalık iç döngü bu
+                # dalı-öngörülebilir kısa yola iner.
+                for j in range(num_thresholds):
+                    if hang[j] < I:
+                        a[j] += 1
+                        hang[j] += 1
+                    else:
+                        break
+                continue
+            for j in range(num_thresholds):
+                if qk >= c[j]:
+                    a[j] += 1
+                    hang[j] = 0
+                elif hang[j] < I:
+                    a[j] += 1
+                    hang[j] += 1
+                else:
+                    break
+        return a
+
+
 def asl_P56(x,fs,nbits):
     """
     ITU-T P.56'ya göre Aktif Konuşma Seviyesini (ASL) hesaplar.
@@ -33,46 +95,71 @@ def asl_P56(x,fs,nbits):
     H = 0.2  # Hangover süresi (saniye).
     M = 15.9 # Marj (dB).
     
-    # Sinyalin float olduğundan emin ol
-    x = np.asarray(x, dtype=float)
+    # 16-bit PCM için float32 yeterlidir; zarf ve eşik karşılaştırma
+    # tamponlarının bellek bant genişliğini yarıya indirir. Skaler enerji
+    # indirgemeleri hassasiyet için float64 biriktirir.
+    x = np.asarray(x, dtype=np.float32)
 
     # --- 2. Eşikleri Oluştur ---
     # Orijinal kodda bu bölüm hatalıydı. Düzeltilmiş hali:
     # 16-bit için 2**-15'ten 2**-1'e kadar 15 eşik oluşturulur.
-    num_thresholds = nbits - 1 
-    c = 2.0 ** np.arange(-num_thresholds, 0) # 2**-15, 2**-14, ..., 2**-1
+    num_thresholds = nbits - 1
+    c = (2.0 ** np.arange(-num_thresholds, 0)).astype(np.float32) # 2**-15, ..., 2**-1
 
-    # --- 3. Aktivite ve Hangover Sayıcılarını Hazırla ---
-    I = np.ceil(fs * H) # Hangover süresi (örnek sayısı cinsinden)
-    a = np.zeros(num_thresholds) # Her eşik için aktivite sayacı
-    hang = np.full(num_thresholds, I) # Her eşik için hangover sayacı
+    # --- 3. Hangover Süresini Hazırla ---
+    I = int(np.ceil(fs * H)) # Hangover süresi (örnek sayısı cinsinden)
 
     # --- 4. Sinyal Zarfını Hesapla ---
-    mean_square_energy = np.mean(x**2)
+    mean_square_energy = float(np.mean(np.square(x), dtype=np.float64))
     if mean_square_energy == 0:
         return -np.inf, 0.0, 0.0
 
-    total_power = np.sum(x**2) # Orijinal koddaki 'sq'
+    total_power = mean_square_energy * len(x) # Orijinal koddaki 'sq'
     x_len = len(x)
 
     g = np.exp(-1 / (fs * T)) # Yumuşatma faktörü
     x_abs = np.abs(x)
-    # Orijinal koddaki lfilter parametresi [1, g] şeklindeydi, doğrusu [1, -g]'dir.
-    p = lfilter([1 - g], [1, -g], x_abs) 
-    q = lfilter([1 - g], [1, -g], p) 
+    if _HAS_NUMBA:
+        # İki lfilter geçişi tek JIT döngüsünde birleştirilir (bkz. _p56_envelope)
+        q = _p56_envelope(np.ascontiguousarray(x_abs, dtype=np.float32), g)
+    else:
+        # Orijinal koddaki lfilter parametresi [1, g] şeklindeydi, doğrusu [1, -g]'dir.
+        # Katsayılar float32 verilir ki lfilter çıktıyı float64'e terfi ettirmesin.
+        b_coef = np.array([1 - g], dtype=np.float32)
+        a_coef = np.array([1, -g], dtype=np.float32)
+        p = lfilter(b_coef, a_coef, x_abs)
+        q = lfilter(b_coef, a_coef, p)
 
     # --- 5. Aktiviteyi Say (Hangover ile birlikte) ---
-    # UYARI: Bu döngü çok verimsizdir ve uzun sinyaller için yavaştır.
-    for k in range(x_len):
-        for j in range(num_thresholds):
-            if (q[k] >= c[j]):
-                a[j] = a[j] + 1
-                hang[j] = 0
-            elif hang[j] < I:
-                a[j] = a[j] + 1
-                hang[j] = hang[j] + 1
-            else:
-                break
+    if _HAS_NUMBA:
+        # Orijinal döngünün ('break' kısa devresi dahil) native sürümü.
+        # Her iki dizi de bitişik float32 geçirilir; yarı-adımlı (strided)
+        # dizilerde Numba belirgin yavaşlar.
+        a = _count_activity_numba(np.ascontiguousarray(q, dtype=np.float32),
+                                  np.ascontiguousarray(c),
+                                  I, num_thresholds).astype(float)
+    else:
+        # Vektörel biçim: her eşik için zarfın eşiği son aştığı örnek indeksi
+        # kümülatif maksimumla izlenir; son aktiviteden en fazla I örnek sonrası
+        # (hangover) da aktif sayılır. Örnek x eşik başına Python bytecode
+        # çalıştıran çift döngünün yerini C döngülü NumPy geçişleri alır.
+        #
+        # Karşılaştırma (N, 15) tek parça kurulursa 10 sn'lik bir kayıtta
+        # megabaytlarca ara dizi oluşur ve her geçiş DRAM'e taşar; bunun
+        # yerine q, L1'e sığan dilimler halinde işlenir ve "son aşma indeksi"
+        # durumu dilimden dilime taşınır — sonuç tek parça hesapla birebir aynı.
+        TILE = 2048
+        a = np.zeros(num_thresholds, dtype=np.int64)
+        last_state = np.full(num_thresholds, -I - 1, dtype=np.int64)
+        for start in range(0, x_len, TILE):
+            chunk = q[start:start + TILE]
+            k_idx = np.arange(start, start + len(chunk))[:, None]
+            above = chunk[:, None] >= c[None, :]                  # (TILE, 15)
+            last_true = np.maximum.accumulate(
+                np.where(above, k_idx, last_state[None, :]), axis=0)
+            a += ((k_idx - last_true) <= I).sum(axis=0)
+            last_state = last_true[-1]
+        a = a.astype(float)
 
     # --- 6. Kesişim Noktasını Bul ---
     if a[0] == 0:
@@ -117,52 +204,25 @@ def asl_P56(x,fs,nbits):
 
 
 
-def bin_interp(upcount,lwcount,upthr,lwthr,Margin,tol):
-    if tol < 0:
-        tol = -tol
+def bin_interp(upcount, lwcount, upthr, lwthr, Margin, tol=0.5):
+    """A(dB) - C(dB) = Margin kesişimini kapalı formda bulur.
 
-    # Check if extreme counts are not already the true active value
-    iterno = 1
-    if (np.abs(upcount-upthr - Margin) < tol):
-        asl_ms_log = upcount
-        cc = upthr
-        return asl_ms_log,cc
-    if (np.abs(lwcount-lwthr - Margin) < tol):
-        asl_ms_log = lwcount
-        cc = lwthr
-        return asl_ms_log,cc
-    
-    # Initalize first middle for given (initial) bounds
-    midcount = (upcount + lwcount)/2.0
-    midthr = (upthr + lwthr)/2.0
-
-    # Repeats loop until `diff' falls inside the tolerance (-tol<=diff<=tol
-    while True:
-        diff = midcount  - midthr - Margin
-        if np.abs(diff) <= tol:
-            break
-        # if tolerance is not met up to 20 iteractions, then relax the
-        # tolerance by 10%
-        iterno = iterno + 1
-
-        if iterno > 20:
-            tol = tol*1.1
-
-        if diff > tol: # then the new bounds are...
-            midcount = (upcount+midcount)/2.0
-            # upper and middle activitiy
-            midthr = (upthr+midthr)/2.0
-            # and the thresholds
-        elif diff < -tol: # then the new bounds are...
-            midcount = (midcount+lwcount)/2.0
-            # middle and lower activity
-            midthr = (midthr+lwthr)/2.0
-            # and the thresholds
-    # Since the tolerance has been satisfied, midcount is selected 
-    # as the interpolated value with a tol [dB] tolerance.
-    asl_ms_log = midcount
-    cc = midthr
-    return asl_ms_log,cc
+    Orijinal MATLAB kodu bu noktayı 20 iterasyona kadar süren bir ikiye
+    bölme (bisection) döngüsüyle arıyordu. Oysa iki eşik arasında hem AdB
+    hem CdB doğrusal interpole edildiğinden fark da doğrusaldır ve kesişim
+    tek bir oranla tam olarak hesaplanır. `tol` parametresi eski arayüzle
+    uyumluluk için tutulur ama artık kullanılmaz.
+    """
+    f_up = upcount - upthr - Margin
+    f_lw = lwcount - lwthr - Margin
+    denom = f_lw - f_up
+    if denom == 0:
+        # Fark iki uçta aynı: aralığın ortası en iyi tahmindir
+        return (upcount + lwcount) / 2.0, (upthr + lwthr) / 2.0
+    t = f_lw / denom
+    asl_ms_log = lwcount + t * (upcount - lwcount)
+    cc = lwthr + t * (upthr - lwthr)
+    return asl_ms_log, cc
 
 
 
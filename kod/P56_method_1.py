@@ -12,8 +12,96 @@ Usage:
 import sys
 import numpy as np
 from scipy.io import wavfile
+from scipy.signal import lfilter
 from audio_utils import read_wav_mono
 
+# Derlenmiş Cython çekirdeği (p56_core) varsa en hızlı yol odur;
+# yoksa Numba JIT, o da yoksa saf NumPy/SciPy yoluna düşülür.
+# p56_core'u derlemek için: python setup_p56_core.py build_ext --inplace
+try:
+    from p56_core import active_level_kernel as _p56_kernel_c
+    _HAS_P56_CORE = True
+except ImportError:
+    _HAS_P56_CORE = False
+
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+if _HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _p56_kernel(absx, g, I, Nlevels, b):
+        """Zarf, hareketli maksimum (hangover) ve eşik sayımını tek geçişte hesaplar.
+
+        Döndürür: (q_tilde, cj, aj, qmax)
+          q_tilde : hangover uygulanmış zarf
+          cj      : geometrik eşik seviyeleri
+          aj      : her eşik için aktivite sayısı (q_tilde >= cj[j])
+          qmax    : zarfın maksimumu (<= 0 ise sinyalde enerji yok demektir)
+        """
+        n = absx.size
+        # Zarf tamponları float32: 16-bit PCM için yeterli hassasiyet,
+        # yarı bellek bant genişliği (eşik/sayım dizileri double kalır)
+        gf = np.float32(g)
+        one_minus_g = np.float32(1.0) - gf
+        q = np.empty(n, dtype=np.float32)
+        q_tilde = np.empty(n, dtype=np.float32)
+        p_prev = np.float32(0.0)
+        q_prev = np.float32(0.0)
+
+        # Monoton azalan deque, indeks tamponu ile taklit edilir:
+        # [head, tail) aralığındaki indeksler geçerli adaylardır.
+        dq_idx = np.empty(n, dtype=np.int64)
+        head = 0
+        tail = 0
+        for i in range(n):
+            # Çift üstel düzeltme (iki kaskad birinci derece IIR)
+            p_prev = gf * p_prev + one_minus_g * absx[i]
+            q_prev = gf * q_prev + one_minus_g * p_prev
+            q[i] = q_prev
+
+            # Hareketli maksimum: [i-I+1, i] penceresi
+            while tail > head and q[dq_idx[tail - 1]] <= q_prev:
+                tail -= 1
+            dq_idx[tail] = i
+            tail += 1
+            while dq_idx[head] < i - I + 1:
+                head += 1
+            q_tilde[i] = q[dq_idx[head]]
+
+        qmax = q_tilde[0]
+        for i in range(1, n):
+            if q_tilde[i] > qmax:
+                qmax = q_tilde[i]
+
+        cj = np.empty(Nlevels)
+        aj = np.zeros(Nlevels)
+        if qmax <= 0.0:
+            return q_tilde, cj, aj, qmax
+
+        c_min = qmax / b ** (Nlevels - 1)
+        for j in range(Nlevels):
+            cj[j] = c_min * b ** j
+
+        # 30 ayrı dizi taraması yerine tek geçişlik histogram:
+        # her örnek, zarf değerinin düştüğü geometrik kovaya eklenir,
+        # ardından üstten kümülatif toplam aj[j] = say(q_tilde >= cj[j]) verir.
+        logb = np.log(b)
+        for i in range(n):
+            v = q_tilde[i]
+            if v < c_min:
+                continue  # hiçbir eşiğin üzerinde değil
+            k = int(np.log(v / c_min) / logb)
+            if k > Nlevels - 1:
+                k = Nlevels - 1
+            aj[k] += 1.0
+        for j in range(Nlevels - 2, -1, -1):
+            aj[j] += aj[j + 1]
+
+        return q_tilde, cj, aj, qmax
+
 def active_speech_level(x, fs, time_constant=0.03, hangover=0.2, M_dB=15.9, b=2.0):
     """
     Compute active speech level using ITU-T P.56 Method B (Kabal description).
@@ -32,68 +120,77 @@ def active_speech_level(x, fs, time_constant=0.03, hangover=0.2, M_dB=15.9, b=2.
       info dict    : internal values (lo, thresholds, counts, etc.)
     """
     # --- 1. Başlangıç Kontrolleri ---
-    x = np.asarray(x, dtype=float)
+    # 16-bit PCM kaynaklar için float32 fazlasıyla yeterlidir ve zarf/eşik
+    # geçişlerindeki bellek bant genişliğini yarıya indirir; skaler
+    # indirgemeler hassasiyet için float64 biriktirir.
+    x = np.asarray(x, dtype=np.float32)
     Ns = x.size
     if Ns == 0:
         raise ValueError("Empty signal")
 
     # Sinyalin ortalama gücünü (enerjisini) hesapla
-    Ex = np.mean(x**2)
+    Ex = float(np.mean(np.square(x), dtype=np.float64))
     if Ex == 0:
         return -np.inf, 0.0, {"reason": "zero-energy"}
 
     # --- 2. Sinyal Zarfını (Envelope) Hesaplama ---
     # P.56'ya göre çift üstel düzeltme (double exponential smoothing) uygulanır.
+    # İki adet birinci dereceden IIR filtresi (lfilter) kaskad olarak uygulanır;
+    # örnek örnek Python döngüsü yerine C döngüsünde çalıştığı için çok daha hızlıdır.
+    # Başlangıç koşulları sıfırdır (p_prev = q_prev = 0 ile aynı sonuç).
     t = 1.0 / fs
     g = np.exp(-t / time_constant)
     absx = np.abs(x)
-    p = np.empty_like(absx)
-    q = np.empty_like(absx)
-    p_prev = 0.0
-    q_prev = 0.0
     one_minus_g = (1.0 - g)
-    for i, v in enumerate(absx):
-        p_curr = g * p_prev + one_minus_g * v
-        q_curr = g * q_prev + one_minus_g * p_curr
-        p[i] = p_curr
-        q[i] = q_curr
-        p_prev = p_curr
-        q_prev = q_curr
-
-    # --- 3. Hangover Uygulaması ---
-    # Zarf (q), konuşma sonlarındaki düşüşleri yumuşatmak için hareketli maksimum filtresinden geçirilir.
     I = int(np.ceil(hangover / t))
-    if I < 1:
-        q_tilde = q.copy()
+    Nlevels = 30
+
+    if _HAS_P56_CORE or _HAS_NUMBA:
+        # Zarf + hangover + eşik sayımı tek derlenmiş çekirdekte (tek bellek geçişi).
+        kernel = _p56_kernel_c if _HAS_P56_CORE else _p56_kernel
+        q_tilde, cj, aj, qmax = kernel(np.ascontiguousarray(absx, dtype=np.float32),
+                                       g, max(I, 1), Nlevels, float(b))
+        if qmax <= 0:
+            return -np.inf, 0.0, {"reason": "no-envelope-energy"}
     else:
-        # efficient moving maximum (simple implementation)
-        from collections import deque
-        q_tilde = np.empty_like(q)
-        dq = deque()
-        for i, val in enumerate(q):
-            # pop from right while smaller than val
-            while dq and dq[-1][0] <= val:
-                dq.pop()
-            dq.append((val, i))
-            # remove outdated
-            while dq and dq[0][1] < i - I + 1:
-                dq.popleft()
-            q_tilde[i] = dq[0][0]
-
-    # --- 4. Eşik Seviyelerini Oluşturma ---
-    # Aktiviteyi ölçmek için geometrik bir dizi halinde eşik seviyeleri (cj) oluşturulur.
-    qmax = q_tilde.max()
-    if qmax <= 0:
-        return -np.inf, 0.0, {"reason": "no-envelope-energy"}
+        # --- 2b. Zarf (iki kaskad birinci derece IIR) ---
+        # Katsayılar float32 verilir ki lfilter çıktıyı float64'e terfi
+        # ettirmesin; zarf tamponları giriş gibi float32 kalır.
+        b_coef = np.array([one_minus_g], dtype=np.float32)
+        a_coef = np.array([1.0, -g], dtype=np.float32)
+        p = lfilter(b_coef, a_coef, absx)
+        q = lfilter(b_coef, a_coef, p)
 
-    Nlevels = 30
-    c_max = qmax
-    c_min = c_max / (b ** (Nlevels - 1))
-    cj = c_min * (b ** np.arange(Nlevels))
+        # --- 3. Hangover Uygulaması ---
+        # Zarf (q), konuşma sonlarındaki düşüşleri yumuşatmak için hareketli maksimum filtresinden geçirilir.
+        if I < 1:
+            q_tilde = q.copy()
+        else:
+            # Derlenmiş C kodu ile nedensel hareketli maksimum: origin kaydırması
+            # pencereyi [i-I+1, i] aralığına oturtur; 'nearest' kenar modu, sol
+            # kenarda q[0] tekrarlandığı için kırpılmış pencere ile aynı sonucu verir.
+            from scipy.ndimage import maximum_filter1d
+            q_tilde = maximum_filter1d(q, size=I, mode='nearest', origin=(I - 1) // 2)
+
+        # --- 4. Eşik Seviyelerini Oluşturma ---
+        # Aktiviteyi ölçmek için geometrik bir dizi halinde eşik seviyeleri (cj) oluşturulur.
+        qmax = q_tilde.max()
+        if qmax <= 0:
+            return -np.inf, 0.0, {"reason": "no-envelope-energy"}
+
+        c_max = qmax
+        c_min = c_max / (b ** (Nlevels - 1))
+        cj = c_min * (b ** np.arange(Nlevels))
+
+        # --- 5. Aktiviteyi Hesaplama ---
+        # Her bir eşik (cj) için, zarfın (q_tilde) o eşiğin üzerinde kaldığı örnek sayısı (aj) sayılır.
+        # cj sıralı bir geometrik dizi olduğundan, q_tilde bir kez sıralanıp
+        # searchsorted ile tüm eşiklerin sayımı tek geçişte bulunur
+        # (30 ayrı boolean tarama yerine O(N log N) + 30 ikili arama).
+        sq = np.sort(q_tilde)
+        idx = np.searchsorted(sq, cj, side='left')
+        aj = (Ns - idx).astype(float)
 
-    # --- 5. Aktiviteyi Hesaplama ---
-    # Her bir eşik (cj) için, zarfın (q_tilde) o eşiğin üzerinde kaldığı örnek sayısı (aj) sayılır.
-    aj = np.array([(q_tilde >= c).sum() for c in cj], dtype=float)
     a_frac = aj / float(Ns)
 
     # --- 6. Kesişim Noktasını Bulma ---
@@ -105,51 +202,41 @@ def active_speech_level(x, fs, time_constant=0.03, hangover=0.2, M_dB=15.9, b=2.
     Clnj = 2.0 * np.log(np.maximum(cj, eps))
 
     # M in natural log units: Mln = ln(m) where m = 10^(M/10)
-    Mln = np.log(10 ** (M_dB / 10.0))
+    # Marj sabitleri döngü dışında bir kez hesaplanır
+    m = 10 ** (M_dB / 10.0)
+    sqrt_m = np.sqrt(m)
+    Mln = np.log(m)
     dAC = Alnj - Clnj
-    ActLev = 0.0
-    lo = 0.0
-    activity = 0.0
-
-    # Kesişim noktasını bulmak için eşikler üzerinde döngüye girilir.
-    # Eğer ilk aralıkta veya sonraki aralıklarda kesişim bulunursa, interpolasyon yapılır.
-    found = False
-    prev_d = None
-    prev_Aln = None
-    for j in range(len(dAC)):
-        if a_frac[j] == 0.0:
-            break
-        d = dAC[j]
-        if j == 0:
-            if d <= Mln:
-                # crossing in first interval
-                Alno = Alnj[j]
-                ActLev = np.exp(Alno / 2.0)
-                lo = cj[j]
-                activity = a_frac[j]
-                found = True
-                break
-        else:
-            if d <= Mln:
-                # j-1 ve j arasında lineer interpolasyon yaparak hassas kesişim noktası bulunur.
-                d_prev = prev_d
-                Aln_prev = prev_Aln
-                alpha = (Mln - d_prev) / (d - d_prev + 1e-300)
-                Alno = Aln_prev + alpha * (Alnj[j] - Aln_prev)
-                ActLev = np.exp(Alno / 2.0)
-                lo = ActLev / np.sqrt(10 ** (M_dB / 10.0))
-                # activity a(lo) from Eq (17): a(lo) = Ex / (m * lo^2)
-                m = 10 ** (M_dB / 10.0)
-                activity = Ex / (m * (lo ** 2) + 1e-300)
-                found = True
-                break
-        prev_d = d
-        prev_Aln = Alnj[j]
-
-    if not found:
+
+    # Kesişim noktası vektörel olarak bulunur: önce aktivitesi sıfır olan ilk
+    # eşiğe kadar olan geçerli bölge belirlenir, ardından dAC <= Mln koşulunu
+    # sağlayan ilk indeks alınır (30 adımlık skaler döngünün karşılığı).
+    if a_frac[0] == 0.0:
+        return -np.inf, 0.0, {"reason": "no_crossing", "dAC": dAC}
+    zero_idx = np.flatnonzero(a_frac == 0.0)
+    limit = zero_idx[0] if zero_idx.size else len(dAC)
+
+    mask = dAC[:limit] <= Mln
+    if not mask.any():
         # Kesişim bulunamazsa, aktivite sıfır kabul edilir.
         return -np.inf, 0.0, {"reason": "no_crossing", "dAC": dAC}
 
+    j = int(mask.argmax())
+    if j == 0:
+        # crossing in first interval
+        Alno = Alnj[0]
+        ActLev = np.exp(Alno / 2.0)
+        lo = cj[0]
+        activity = a_frac[0]
+    else:
+        # j-1 ve j arasında lineer interpolasyon yaparak hassas kesişim noktası bulunur.
+        alpha = (Mln - dAC[j - 1]) / (dAC[j] - dAC[j - 1] + 1e-300)
+        Alno = Alnj[j - 1] + alpha * (Alnj[j] - Alnj[j - 1])
+        ActLev = np.exp(Alno / 2.0)
+        lo = ActLev / sqrt_m
+        # activity a(lo) from Eq (17): a(lo) = Ex / (m * lo^2)
+        activity = Ex / (m * (lo ** 2) + 1e-300)
+
     # --- 7. Sonuçları Döndürme ---
     # Hesaplanan aktif seviyeyi (RMS genliği) desibel (dB) cinsine çevir.
     ref = 1.0  # Referans olarak tam ölçek (Full-Scale) kabul edilir.
@@ -2,20 +2,41 @@ import numpy as np
 from scipy.io import wavfile
 import random
 import os
+from concurrent.futures import ProcessPoolExecutor
 from P56_method_1 import active_speech_level
-from audio_utils import read_wav_mono
+from audio_utils import read_wav_mono, peak_abs
 
-def mix_at_snr(speech, noise, fs, snr_db, speech_info=None, use_active_speech=True):
-    """Bir konuşma ve gürültü sinyalini hedeflenen SNR'da karıştırır."""
-    N = len(speech)
-    
-    # 1. Gürültü sinyalinin uzunluğunu konuşma ile eşleştir
+def match_noise_length(noise, N):
+    """Gürültü sinyalini N örnek uzunluğuna getirir.
+
+    Kısa gürültü, np.tile + dilimleme (tam tekrar sayısı kadar gereksiz
+    tahsis) yerine dairesel indekslemeyle doğrudan N örneğe uzatılır; uzun
+    gürültüden rastgele bir kesit alınır. Uzunluk zaten eşleşiyorsa sinyal
+    kopyalanmadan döndürülür, bu sayede çağıran uzatmayı SNR döngüsünün
+    dışına alabilir.
+    """
     if len(noise) < N:
-        repeats = int(np.ceil(N / len(noise)))
-        noise = np.tile(noise, repeats)[:N]
-    elif len(noise) > N:
+        idx = np.arange(N)
+        np.mod(idx, len(noise), out=idx)
+        return noise[idx]
+    if len(noise) > N:
         start = random.randint(0, len(noise) - N)
-        noise = noise[start:start+N]
+        return noise[start:start+N]
+    return noise
+
+
+def mix_at_snr(speech, noise, fs, snr_db, speech_info=None, use_active_speech=True,
+               noise_power=None):
+    """Bir konuşma ve gürültü sinyalini hedeflenen SNR'da karıştırır.
+
+    noise_power verilirse gürültü gücü yeniden hesaplanmaz; çağıran tam
+    uzunluktaki gürültü üzerinden bir kez hesaplayıp tüm SNR'larda ve tüm
+    konuşmalarda yeniden kullanabilir.
+    """
+    N = len(speech)
+
+    # 1. Gürültü sinyalinin uzunluğunu konuşma ile eşleştir
+    noise = match_noise_length(noise, N)
 
     # 2. Konuşma gücünü (Ps) hesapla
     if use_active_speech and speech_info is not None and "ActLev_sample_units" in speech_info:
@@ -24,7 +45,7 @@ def mix_at_snr(speech, noise, fs, snr_db, speech_info=None, use_active_speech=Tr
         Ps = np.mean(speech**2)
 
     # 3. Gürültü gücünü (Pn) hesapla ve ayarla
-    Pn0 = np.mean(noise**2)
+    Pn0 = noise_power if noise_power is not None else np.mean(noise**2)
     if Pn0 <= 0:
         raise ValueError("Noise signal has zero power")
 
@@ -33,16 +54,95 @@ def mix_at_snr(speech, noise, fs, snr_db, speech_info=None, use_active_speech=Tr
     Pn_desired = Ps / factor
     alpha = np.sqrt(Pn_desired / Pn0)
 
-    # 4. Sinyalleri karıştır
-    mixed = speech + (alpha * noise)
+    # 4. Sinyalleri karıştır (yerinde, float32): alpha*noise için ayrı bir
+    # ara dizi ayrılmaz, çıktı tamponu tek seferde doldurulur
+    mixed = np.empty(N, dtype=np.float32)
+    np.multiply(noise, np.float32(alpha), out=mixed)
+    mixed += speech
 
-    # 5. Kırpılmayı (clipping) önle
-    max_abs = np.max(np.abs(mixed))
+    # 5. Kırpılmayı (clipping) önle (bölme yerine yerinde çarpma)
+    max_abs = peak_abs(mixed)
     if max_abs > 1.0:
-        mixed = mixed / max_abs
+        mixed *= np.float32(1.0 / max_abs)
 
     return mixed, alpha
 
+
+# Süreç içi konuşma önbelleği: aynı konuşma dosyası her gürültüyle
+# eşleştiği için okuma + P.56 analizi işçi başına bir kez yapılır.
+_speech_cache = {}
+
+
+def _get_speech(speech_path):
+    cached = _speech_cache.get(speech_path)
+    if cached is None:
+        fs_s, speech = read_wav_mono(speech_path)
+        _, _, speech_info = active_speech_level(speech, fs_s)
+        cached = (fs_s, speech, speech_info)
+        _speech_cache[speech_path] = cached
+    return cached
+
+
+# Süreç içi gürültü önbelleği: gürültü korpusu küçük ve her konuşmayla
+# eşleştiği için her işçi her gürültüyü diskten yalnızca bir kez okur;
+# ortalama güç (Pn0) de tam uzunluk üzerinden bir kez hesaplanır.
+_noise_cache = {}
+
+
+def _get_noise(noise_path):
+    cached = _noise_cache.get(noise_path)
+    if cached is None:
+        fs_n, noise = read_wav_mono(noise_path)
+        Pn0 = float(np.mean(np.square(noise), dtype=np.float64))
+        cached = (fs_n, noise, Pn0)
+        _noise_cache[noise_path] = cached
+    return cached
+
+
+def _process_pair(job):
+    """Havuz işçisi: bir (konuşma, gürültü) çiftini tüm SNR değerleriyle karıştırır.
+
+    Çift başına bir görev kullanılır: konuşma/gürültü bir kez okunur, tüm
+    SNR çıktıları aynı işçide üretilir. Yazılan dosya sayısını döndürür.
+    """
+    speech_path, noise_path, snr_list, output_dir = job
+
+    fs_s, speech, speech_info = _get_speech(speech_path)
+    fs_n, noise, noise_power = _get_noise(noise_path)
+
+    if fs_s != fs_n:
+        print(f"Uyarı: Örnekleme frekansları uyuşmuyor. Atlanıyor: {os.path.basename(speech_path)} ({fs_s}Hz) & {os.path.basename(noise_path)} ({fs_n}Hz)")
+        return 0
+
+    speech_basename = os.path.splitext(os.path.basename(speech_path))[0]
+    noise_basename = os.path.splitext(os.path.basename(noise_path))[0]
+
+    # Uzunluk eşleştirme tüm SNR değerleri için aynıdır; SNR döngüsünün
+    # dışına alınır (mix_at_snr eşit uzunlukta sinyali olduğu gibi kullanır)
+    noise = match_noise_length(noise, len(speech))
+
+    written = 0
+    for snr in snr_list:
+        mixed, _ = mix_at_snr(speech, noise, fs_s, snr_db=snr, speech_info=speech_info,
+                              use_active_speech=True, noise_power=noise_power)
+
+        # Dinamik çıktı yolu ve adı oluştur
+        snr_output_dir = os.path.join(output_dir, f"{snr}dB")
+        os.makedirs(snr_output_dir, exist_ok=True)
+        output_filename = f"{speech_basename}__{noise_basename}__{snr}dB.wav"
+        output_path = os.path.join(snr_output_dir, output_filename)
+
+        # int16 dönüşümü yerinde ölçekleme + yuvarlama ile yapılır; tek
+        # kalan kopya astype'ın kendisidir
+        np.multiply(mixed, np.float32(32767.0), out=mixed)
+        np.rint(mixed, out=mixed)
+        wavfile.write(output_path, fs_s, mixed.astype(np.int16))
+        written += 1
+
+    print(f"Tamamlandı: {os.path.basename(speech_path)} + {os.path.basename(noise_path)} ({written} SNR)")
+    return written
+
+
 def main():
     """Belirtilen klasörlerdeki tüm konuşma ve gürültü dosyalarını,
     belirtilen SNR seviyelerinde toplu olarak karıştırır."""
@@ -67,37 +167,21 @@ def main():
 
     total_jobs = len(speech_files) * len(noise_files) * len(TARGET_SNRS)
     print(f"Toplam {total_jobs} karıştırma işlemi gerçekleştirilecek...")
-    job_count = 0
-
-    # Her bir konuşma dosyasını, her bir gürültü dosyası ve SNR değeri ile karıştır
-    for speech_path in speech_files:
-        fs_s, speech = read_wav_mono(speech_path)
-        _, _, speech_info = active_speech_level(speech, fs_s)
-
-        for noise_path in noise_files:
-            fs_n, noise = read_wav_mono(noise_path)
-
-            if fs_s != fs_n:
-                print(f"Uyarı: Örnekleme frekansları uyuşmuyor. Atlanıyor: {os.path.basename(speech_path)} ({fs_s}Hz) & {os.path.basename(noise_path)} ({fs_n}Hz)")
-                continue
-
-            for snr in TARGET_SNRS:
-                job_count += 1
-                print(f"[{job_count}/{total_jobs}] İşleniyor: {os.path.basename(speech_path)} + {os.path.basename(noise_path)} @ {snr}dB")
-
-                mixed, _ = mix_at_snr(speech, noise, fs_s, snr_db=snr, speech_info=speech_info, use_active_speech=True)
 
-                # Dinamik çıktı yolu ve adı oluştur
-                speech_basename = os.path.splitext(os.path.basename(speech_path))[0]
-                noise_basename = os.path.splitext(os.path.basename(noise_path))[0]
-                snr_output_dir = os.path.join(OUTPUT_DIR, f"{snr}dB")
-                os.makedirs(snr_output_dir, exist_ok=True)
-                output_filename = f"{speech_basename}__{noise_basename}__{snr}dB.wav"
-                output_path = os.path.join(snr_output_dir, output_filename)
+    # Her (konuşma, gürültü) çifti bağımsız bir görevdir; tüm SNR değerleri
+    # aynı görevde üretilir. Görevler konuşma sıralı verildiği ve chunksize
+    # ardışık görevleri aynı işçiye yolladığı için süreç içi konuşma
+    # önbelleği etkili çalışır.
+    jobs = [(speech_path, noise_path, TARGET_SNRS, OUTPUT_DIR)
+            for speech_path in speech_files
+            for noise_path in noise_files]
 
-                wavfile.write(output_path, fs_s, (mixed * 32767).astype(np.int16))
+    written_total = 0
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for written in executor.map(_process_pair, jobs, chunksize=4):
+            written_total += written
 
-    print(f"\n--- Tüm {total_jobs} işlem tamamlandı. Çıktılar '{OUTPUT_DIR}' klasörüne kaydedildi. ---")
+    print(f"\n--- Tüm işlemler tamamlandı ({written_total}/{total_jobs} dosya yazıldı). Çıktılar '{OUTPUT_DIR}' klasörüne kaydedildi. ---")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
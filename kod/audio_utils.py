@@ -1,23 +1,50 @@
 import numpy as np
-from scipy.io import wavfile
+import soundfile as sf
+
+# Numba varsa tepe genlik tek kaynaşık döngüde bulunur; np.max(np.abs(x))
+# önce tam boy bir |x| kopyası çıkarıp sonra tarar (iki bellek geçişi).
+try:
+    from numba import njit
+    _HAS_NUMBA = True
+except ImportError:
+    _HAS_NUMBA = False
+
+if _HAS_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _peak_abs_numba(x):
+        m = 0.0
+        for v in x:
+            a = abs(v)
+            if a > m:
+                m = a
+        return m
+
+
+def peak_abs(x):
+    """|x|'in maksimumunu döndürür (kırpılma ve sessizlik kontrolleri için).
+
+    Numba varsa geçici |x| dizisi ayrılmadan tek geçişte hesaplanır; yoksa
+    NumPy'ın iki geçişli karşılığına düşülür.
+    """
+    if _HAS_NUMBA:
+        return _peak_abs_numba(np.ascontiguousarray(x))
+    return float(np.abs(x).max())
+
 
 def read_wav_mono(path):
     """Reads a WAV file and converts it to a normalized, mono float signal."""
-    # 1. Ses dosyasını ve örnekleme frekansını oku
-    fs, data = wavfile.read(path)
-    
-    # 2. Veri tipini kontrol et ve normalize et
-    if data.dtype.kind == 'i':
-        # Tamsayı (integer) ise, [-1.0, 1.0] aralığında ondalıklı (float) sayıya dönüştür
-        max_val = float(np.iinfo(data.dtype).max)
-        data = data.astype(float) / (max_val + 1.0)
-    elif data.dtype.kind == 'f':
-        # Zaten ondalıklı ise, sadece tipini float olarak doğrula
-        data = data.astype(float)
-
-    # 3. Çok kanallı (stereo vb.) ise tek kanala (mono) indirge
+    # 1. Dosyayı soundfile ile aç ve doğrudan float32 olarak oku.
+    # Decode C tarafında yapılır ve örnekler [-1.0, 1.0] aralığına ölçeklenmiş
+    # gelir; scipy.io.wavfile gibi tüm dosyayı önce ham tamsayı tamponuna
+    # kopyalamak gerekmez. Çok büyük dosyalar için f.blocks(...) ile blok blok
+    # okumaya da izin verir.
+    with sf.SoundFile(path) as f:
+        fs = f.samplerate
+        data = f.read(dtype='float32', always_2d=False)
+
+    # 2. Çok kanallı (stereo vb.) ise tek kanala (mono) indirge
     if data.ndim > 1:
-        data = data.mean(axis=1)
+        data = data.mean(axis=1, dtype=np.float32)
 
-    # 4. Örnekleme frekansını ve işlenmiş mono sinyali döndür
-    return fs, data
\ No newline at end of file
+    # 3. Örnekleme frekansını ve işlenmiş mono sinyali döndür
+    return fs, data
@@ -0,0 +1,88 @@
+# cython: boundscheck=False, wraparound=False, cdivision=True, language_level=3
+"""
+ITU-T P.56 zarf + hangover + eşik histogramı için derlenmiş çekirdek.
+
+P56_method_1.py içindeki Numba çekirdeğinin Cython/C karşılığıdır; tüm
+aşamalar sinyal üzerinde tek geçişte çalışır. Sinyal tamponları float32
+tutulur (16-bit PCM için fazlasıyla yeterli, bellek bant genişliği yarıya
+iner); eşik/sayım dizileri 30 elemanlık olduğundan double kalır.
+Derlemek için:
+
+  python setup_p56_core.py build_ext --inplace
+
+Derlenmişse P56_method_1.py bu modülü otomatik olarak kullanır.
+"""
+import numpy as np
+from libc.math cimport log
+
+
+def active_level_kernel(float[::1] absx, double g, Py_ssize_t I,
+                        int Nlevels, double b):
+    """Zarf, hareketli maksimum (hangover) ve eşik sayımını tek geçişte hesaplar.
+
+    Döndürür: (q_tilde, cj, aj, qmax) — P56_method_1._p56_kernel ile aynı.
+    """
+    cdef Py_ssize_t n = absx.shape[0]
+    cdef float gf = <float>g
+    cdef float one_minus_g = <float>1.0 - gf
+    cdef float p_prev = 0.0
+    cdef float q_prev = 0.0
+    cdef Py_ssize_t i, head, tail, k
+    cdef int j
+
+    q_arr = np.empty(n, dtype=np.float32)
+    q_tilde_arr = np.empty(n, dtype=np.float32)
+    dq_arr = np.empty(n, dtype=np.intp)
+    cdef float[::1] q = q_arr
+    cdef float[::1] q_tilde = q_tilde_arr
+    cdef Py_ssize_t[::1] dq_idx = dq_arr
+
+    # Monoton azalan deque, indeks tamponu ile taklit edilir.
+    head = 0
+    tail = 0
+    for i in range(n):
+        # Çift üstel düzeltme (iki kaskad birinci derece IIR)
+        p_prev = gf * p_prev + one_minus_g * absx[i]
+        q_prev = gf * q_prev + one_minus_g * p_prev
+        q[i] = q_prev
+
+        # Hareketli maksimum: [i-I+1, i] penceresi
+        while tail > head and q[dq_idx[tail - 1]] <= q_prev:
+            tail -= 1
+        dq_idx[tail] = i
+        tail += 1
+        while dq_idx[head] < i - I + 1:
+            head += 1
+        q_tilde[i] = q[dq_idx[head]]
+
+    cdef double qmax = q_tilde[0]
+    for i in range(1, n):
+        if q_tilde[i] > qmax:
+            qmax = q_tilde[i]
+
+    cj_arr = np.empty(Nlevels, dtype=np.float64)
+    aj_arr = np.zeros(Nlevels, dtype=np.float64)
+    cdef double[::1] cj = cj_arr
+    cdef double[::1] aj = aj_arr
+    if qmax <= 0.0:
+        return q_tilde_arr, cj_arr, aj_arr, qmax
+
+    cdef double c_min = qmax / b ** (Nlevels - 1)
+    for j in range(Nlevels):
+        cj[j] = c_min * b ** j
+
+    # Tek geçişlik histogram; üstten kümülatif toplam aj[j] = say(q_tilde >= cj[j])
+    cdef double logb = log(b)
+    cdef double v
+    for i in range(n):
+        v = q_tilde[i]
+        if v < c_min:
+            continue
+        k = <Py_ssize_t>(log(v / c_min) / logb)
+        if k > Nlevels - 1:
+            k = Nlevels - 1
+        aj[k] += 1.0
+    for j in range(Nlevels - 2, -1, -1):
+        aj[j] += aj[j + 1]
+
+    return q_tilde_arr, cj_arr, aj_arr, qmax
@@ -0,0 +1,25 @@
+"""p56_core Cython uzantısını derler.
+
+Kullanım (kod/ klasörü içinde):
+  pip install cython numpy
+  python setup_p56_core.py build_ext --inplace
+"""
+from setuptools import setup, Extension
+from Cython.Build import cythonize
+import numpy as np
+
+extensions = [
+    Extension(
+        "p56_core",
+        ["p56_core.pyx"],
+        include_dirs=[np.get_include()],
+        # -march=native ile IIR güncellemeleri ve karşılaştırmalar
+        # otomatik vektörize edilir (AVX2 varsa).
+        extra_compile_args=["-O3", "-march=native", "-ffast-math"],
+    )
+]
+
+setup(
+    name="p56_core",
+    ext_modules=cythonize(extensions, language_level=3),
+)